@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 the HERA Collaboration
+# Licensed under the 2-clause BSD License.
+
+"""Add composite index on FileEvent.name and FileEvent.type.
+
+The new index serves lookups by name alone as well, so it replaces the old
+single-column `file_event_name` index.
+
+Revision ID: 6a1c4e7b2d93
+Revises: fa863eafacb0
+Create Date: 2026-10-15 10:12:47.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '6a1c4e7b2d93'
+down_revision = 'fa863eafacb0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('file_event_name_type', 'file_event', ['name', 'type'], unique=False)
+    op.drop_index('file_event_name', table_name='file_event')
+
+
+def downgrade():
+    op.create_index('file_event_name', 'file_event', ['name'], unique=False)
+    op.drop_index('file_event_name_type', table_name='file_event')
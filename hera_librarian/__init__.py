@@ -30,12 +30,31 @@ class NoSuchConnectionError(Exception):
         self.conn_name = conn_name
 
 
+_client_config_cache = None  # (path, mtime_ns, parsed config)
+
+
 def get_client_config():
-    """Parse the client configuration file and return it as a dictionary."""
+    """Parse the client configuration file and return it as a dictionary.
+
+    The parsed configuration is cached and only re-read if the file's path or
+    modification time changes, since every LibrarianClient created without an
+    explicit config goes through here. Callers must not modify the returned
+    dictionary.
+
+    """
+    global _client_config_cache
+
     path = os.path.expanduser('~/.hl_client.cfg')
+    mtime = os.stat(path).st_mtime_ns
+
+    if _client_config_cache is not None and _client_config_cache[:2] == (path, mtime):
+        return _client_config_cache[2]
+
     with open(path, 'r') as f:
         s = f.read()
-    return json.loads(s)
+    config = json.loads(s)
+    _client_config_cache = (path, mtime, config)
+    return config
 
 
 def all_connections():
@@ -197,6 +216,7 @@ class LibrarianClient(object):
         client_id=None,
         transfer_token=None,
         source_endpoint_id=None,
+        use_sftp=False,
     ):
         """Upload the file located at `local_path` to the Librarian.
 
@@ -284,6 +304,10 @@ class LibrarianClient(object):
             The `host_path` of the globus store. When using shared endpoints,
             this is the root directory presented to the client. Note that this
             may be different from the `path_prefix` for a given store.
+        use_sftp : bool
+            Indicates whether to try to use pipelined SFTP (via the optional
+            asyncssh package) to transfer files instead of the default rsync.
+            Ignored if `use_globus` is True.
 
         Returns
         -------
@@ -352,6 +376,7 @@ class LibrarianClient(object):
             source_endpoint_id,
             destination_endpoint_id,
             host_path,
+            try_sftp=use_sftp,
         )
 
         # If we made it here, though, the upload succeeded and we can tell
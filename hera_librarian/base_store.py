@@ -18,12 +18,30 @@ BaseStore
 
 import subprocess
 import os.path
+import posixpath
 import time
 import warnings
 
 from . import RPCError
 
 NUM_RSYNC_TRIES = 6
+SFTP_BLOCK_SIZE = 32768  # bytes per SFTP read/write request
+SFTP_MAX_REQUESTS = 128  # number of SFTP requests kept in flight at once
+
+# Options passed to the SSH invocations that run short commands on a store, so
+# that successive commands to the same host share one connection: the first
+# one sets up a master connection that lingers for a minute, and later ones
+# skip the TCP and key-exchange handshakes by riding on it. Bulk transfers
+# (rsync, streaming) don't use these: they'd all be funneled through a single
+# TCP stream, and they'd lose their own transport options such as the cipher.
+# The control socket lives in the user's ~/.ssh rather than world-writable /tmp,
+# so other local users can't pre-create or hijack it; ssh expands the "~"
+# itself, and just runs without multiplexing if it can't create the socket.
+SSH_MULTIPLEX_OPTIONS = [
+    '-o', 'ControlMaster=auto',
+    '-o', 'ControlPath=~/.ssh/librarian-%C',
+    '-o', 'ControlPersist=60',
+]
 
 
 class BaseStore(object):
@@ -42,13 +60,15 @@ class BaseStore(object):
 
     # Direct store access. All paths sent to SSH commands should be filtered
     # through self._path() to prepend the path_prefix and make sure that we're
-    # not accidentally passing absolute paths around.
+    # not accidentally passing absolute paths around. Store paths live on the
+    # remote host, so we always manipulate them as POSIX paths, whatever the
+    # local platform.
 
     def _path(self, *pieces):
         for p in pieces:
-            if os.path.isabs(p):
+            if posixpath.isabs(p):
                 raise ValueError('store paths must not be absolute; got %r' % (pieces,))
-        return os.path.join(self.path_prefix, *pieces)
+        return posixpath.join(self.path_prefix, *pieces)
 
     def _ssh_slurp(self, command, input=None):
         """SSH to the store host, run a command, and return its standard output. Raise
@@ -65,25 +85,22 @@ class BaseStore(object):
         layer of Python string literal quoting on top of that!
 
         """
-        argv = ['ssh', self.ssh_host, command]
+        argv = ['ssh'] + SSH_MULTIPLEX_OPTIONS + [self.ssh_host, command]
 
         if input is None:
-            import os
-            stdin = open(os.devnull, 'rb')
+            stdin_kwargs = {'stdin': subprocess.DEVNULL}
         else:
-            stdin = subprocess.PIPE
+            stdin_kwargs = {'input': input}
 
-        proc = subprocess.Popen(argv, shell=False, stdin=stdin,
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if input is None:
-            stdin.close()
-        stdout, stderr = proc.communicate(input=input)
+        proc = subprocess.run(argv, shell=False, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, **stdin_kwargs)
 
         if proc.returncode != 0:
             raise RPCError(argv, 'exit code %d; stdout:\n\n%r\n\nstderr:\n\n%r'
-                           % (proc.returncode, stdout.decode("utf-8"), stderr.decode("utf-8")))
+                           % (proc.returncode, proc.stdout.decode("utf-8"),
+                              proc.stderr.decode("utf-8")))
 
-        return stdout
+        return proc.stdout
 
     def _stream_path(self, store_path):
         """Return a subprocess.Popen instance that streams file contents on its
@@ -94,14 +111,10 @@ class BaseStore(object):
         "b", the returned tar file will contain "bar/a" and "bar/b".
 
         """
-        import os
         argv = ['ssh', self.ssh_host, "librarian_stream_file_or_directory.sh '%s'" %
                 self._path(store_path)]
-        stdin = open(os.devnull, 'rb')
-        proc = subprocess.Popen(argv, shell=False, stdin=stdin,
+        return subprocess.Popen(argv, shell=False, stdin=subprocess.DEVNULL,
                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdin.close()
-        return proc
 
     def _rsync_transfer(self, local_path, store_path):
         """Copy a file to a particular path using rsync.
@@ -149,16 +162,100 @@ class BaseStore(object):
         success = False
 
         for i in range(NUM_RSYNC_TRIES):
-            proc = subprocess.Popen(argv, shell=False, stdout=subprocess.PIPE,
-                                    stderr=subprocess.STDOUT)
-            output = proc.communicate()[0]
+            proc = subprocess.run(argv, shell=False, stdin=subprocess.DEVNULL,
+                                  stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
 
             if proc.returncode == 0:
                 success = True
                 break
 
         if not success:
-            raise RPCError(argv, 'exit code %d; output:\n\n%r' % (proc.returncode, output))
+            raise RPCError(argv, 'exit code %d; output:\n\n%r' % (proc.returncode, proc.stdout))
+
+    def _sftp_transfer(self, local_path, store_path):
+        """Copy a file to a particular path using SFTP.
+
+        Unlike scp, which issues one synchronous request at a time, the
+        asyncssh SFTP client pipelines many read/write requests over a single
+        channel. This hides the round-trip latency of long-haul links and keeps
+        the TCP window full.
+
+        Parameters
+        ----------
+        local_path : str
+            Path to local file to be copied. This may be a directory, in which
+            case it is copied recursively.
+        store_path : str
+            Path to store file at on destination host.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RPCError
+            Raised if the SFTP transfer does not complete successfully or if
+            the asyncssh package is not installed.
+        """
+        try:
+            import asyncio
+            import asyncssh
+        except ModuleNotFoundError:
+            raise RPCError(
+                "asyncssh import",
+                "The asyncssh package must be installed for SFTP "
+                "functionality. Please `pip install asyncssh` and try again."
+            )
+
+        # Our "ssh_host" may be of the form "user@host"; asyncssh wants the
+        # pieces separately. As with rsync, we don't check host keys.
+
+        connect_kwargs = {'known_hosts': None}
+
+        if '@' in self.ssh_host:
+            connect_kwargs['username'], host = self.ssh_host.split('@', 1)
+        else:
+            host = self.ssh_host
+
+        dest_path = self._path(store_path)
+
+        # Match the semantics of rsync with a trailing slash on a directory:
+        # its contents land directly in `dest_path`, rather than in a nested
+        # subdirectory named after `local_path`. SFTP nests a single source
+        # directory if the destination already exists, so we create the
+        # destination ourselves and upload the directory's entries into it.
+        is_dir = os.path.isdir(local_path)
+
+        if is_dir:
+            src_paths = [os.path.join(local_path, name)
+                         for name in sorted(os.listdir(local_path))]
+        else:
+            src_paths = local_path
+
+        async def put():
+            async with asyncssh.connect(host, **connect_kwargs) as conn:
+                async with conn.start_sftp_client() as sftp:
+                    if is_dir:
+                        await sftp.makedirs(dest_path, exist_ok=True)
+
+                        if not src_paths:
+                            return
+
+                    # preserve=True keeps permissions and mtimes, like `rsync -a`.
+                    await sftp.put(
+                        src_paths,
+                        dest_path,
+                        preserve=True,
+                        recurse=True,
+                        block_size=SFTP_BLOCK_SIZE,
+                        max_requests=SFTP_MAX_REQUESTS,
+                    )
+
+        try:
+            asyncio.run(put())
+        except (OSError, asyncssh.Error) as e:
+            raise RPCError("sftp transfer", str(e))
 
     def _globus_transfer(
         self,
@@ -298,6 +395,7 @@ class BaseStore(object):
         source_endpoint_id=None,
         destination_endpoint_id=None,
         host_path=None,
+        try_sftp=False,
     ):
         """Transfer a file to a particular path in the store.
 
@@ -327,6 +425,10 @@ class BaseStore(object):
             The `host_path` of the globus store. When using shared endpoints,
             this is the root directory presented to the client. Note that this
             may be different from the `path_prefix` for a given store.
+        try_sftp : bool, optional
+            Whether to try to use pipelined SFTP to transfer. Ignored if
+            `try_globus` is True. If SFTP fails, automatically fall back on
+            rsync.
 
         Returns
         -------
@@ -347,6 +449,13 @@ class BaseStore(object):
                 # something went wrong with globus--fall back on rsync
                 print("Globus transfer failed: {}\nFalling back on rsync...".format(e))
                 self._rsync_transfer(local_path, store_path)
+        elif try_sftp:
+            try:
+                self._sftp_transfer(local_path, store_path)
+            except RPCError as e:
+                # something went wrong with SFTP--fall back on rsync
+                print("SFTP transfer failed: {}\nFalling back on rsync...".format(e))
+                self._rsync_transfer(local_path, store_path)
         else:
             # use rsync from the get-go
             self._rsync_transfer(local_path, store_path)
@@ -399,7 +508,7 @@ class BaseStore(object):
         are really directories, I believe that is simply not possible.
 
         """
-        dest_parent = os.path.dirname(dest_store_path)
+        dest_parent = posixpath.dirname(dest_store_path)
         ssp = self._path(source_store_path)
         dsp = self._path(dest_store_path)
 
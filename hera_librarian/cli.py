@@ -215,6 +215,8 @@ def config_add_obs_subparser(sub_parsers):
                     help="The 'store' name under which the Librarian knows this computer.")
     sp.add_argument("paths", metavar="PATHS", nargs="+",
                     help="The paths to the files on this computer.")
+    sp.add_argument("-j", "--jobs", dest="jobs", type=int, default=4,
+                    help="How many files to gather information about at once (default: 4).")
     sp.set_defaults(func=add_obs)
 
     return
@@ -554,6 +556,12 @@ def config_upload_subparser(sub_parsers):
        metavar="SOURCE-ENDPOINT-ID",
        help="The source endpoint ID for the globus transfer.",
    )
+   sp.add_argument(
+       "--use_sftp",
+       dest="use_sftp",
+       action="store_true",
+       help="Specify that we should try to use pipelined SFTP to transfer data.",
+   )
    sp.set_defaults(func=upload)
 
    return
@@ -596,14 +604,24 @@ def add_obs(args):
     """
     Register a list of files with the librarian.
     """
-    # Load the info ...
+    # Load the info ... Gathering it means reading every byte of every file
+    # to compute MD5s, so we fan the work out over a bounded pool of threads.
+    # hashlib releases the GIL while it hashes, so the reads overlap nicely.
+    # Any exception raised while gathering is re-raised when we iterate over
+    # the results.
+    from concurrent.futures import ThreadPoolExecutor
+
+    if args.jobs < 1:
+        die("--jobs must be at least 1; got {}".format(args.jobs))
+
     print("Gathering information ...")
+    paths = [os.path.abspath(path) for path in args.paths]
     file_info = {}
 
-    for path in args.paths:
-        path = os.path.abspath(path)
-        print("  ", path)
-        file_info[path] = utils.gather_info_for_path(path)
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        for path, info in zip(paths, executor.map(utils.gather_info_for_path, paths)):
+            print("  ", path)
+            file_info[path] = info
 
     # ... and upload what we learned
     print("Registering with Librarian.")
@@ -1036,6 +1054,7 @@ def upload(args):
             client_id=args.client_id,
             transfer_token=args.transfer_token,
             source_endpoint_id=args.source_endpoint_id,
+            use_sftp=args.use_sftp,
         )
     except RPCError as e:
         die("upload failed: {}".format(e))
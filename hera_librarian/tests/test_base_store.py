@@ -12,6 +12,8 @@ import os
 import tempfile
 import json
 import shutil
+import sys
+import types
 from hera_librarian import base_store, RPCError
 
 from . import ALL_FILES, filetypes, obsids, md5sums, pathsizes
@@ -215,3 +217,130 @@ def test_get_space_info(local_store):
     shutil.rmtree(os.path.join(local_store[1]))
 
     return
+
+
+class FakeSFTPClient(object):
+    """Stand-in for an asyncssh SFTP client that records the calls made to it."""
+
+    def __init__(self, put_error=None):
+        self.put_error = put_error
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def makedirs(self, path, exist_ok=False):
+        self.calls.append(("makedirs", path, exist_ok))
+
+    async def put(self, srcpaths, dstpath, **kwargs):
+        self.calls.append(("put", srcpaths, dstpath, kwargs))
+
+        if self.put_error is not None:
+            raise self.put_error
+
+
+@pytest.fixture
+def fake_asyncssh(monkeypatch):
+    """Install a fake asyncssh module and return its SFTP client."""
+    module = types.ModuleType("asyncssh")
+
+    class Error(Exception):
+        pass
+
+    sftp = FakeSFTPClient()
+
+    class FakeConnection(object):
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        def start_sftp_client(self):
+            return sftp
+
+    module.Error = Error
+    module.connect = lambda host, **kwargs: FakeConnection()
+    monkeypatch.setitem(sys.modules, "asyncssh", module)
+
+    return sftp
+
+
+def test_sftp_transfer_file(tmpdir, local_store, fake_asyncssh):
+    tmppath = os.path.join(str(tmpdir), "my_file.txt")
+    with open(tmppath, "w") as f:
+        print("hello world", file=f)
+
+    local_store[0]._sftp_transfer(tmppath, "my_file.txt")
+
+    # a single file is uploaded directly to its destination path
+    assert len(fake_asyncssh.calls) == 1
+    name, srcpaths, dstpath, kwargs = fake_asyncssh.calls[0]
+    assert name == "put"
+    assert srcpaths == tmppath
+    assert dstpath == os.path.join(local_store[1], "my_file.txt")
+    assert kwargs["preserve"]
+
+    # clean up
+    shutil.rmtree(os.path.join(local_store[1]))
+
+    return
+
+
+def test_sftp_transfer_directory(tmpdir, local_store, fake_asyncssh):
+    for name in ["b.txt", "a.txt"]:
+        with open(os.path.join(str(tmpdir), name), "w") as f:
+            print("hello world", file=f)
+
+    # like rsync with a trailing slash, the directory's contents should land
+    # directly in the destination rather than in a nested subdirectory
+    local_store[0]._sftp_transfer(str(tmpdir), "test_directory")
+
+    dirpath = os.path.join(local_store[1], "test_directory")
+    assert fake_asyncssh.calls[0] == ("makedirs", dirpath, True)
+    name, srcpaths, dstpath, kwargs = fake_asyncssh.calls[1]
+    assert name == "put"
+    assert srcpaths == [os.path.join(str(tmpdir), "a.txt"), os.path.join(str(tmpdir), "b.txt")]
+    assert dstpath == dirpath
+    assert kwargs["preserve"]
+    assert kwargs["recurse"]
+
+    # an empty directory just creates the destination
+    emptydir = os.path.join(str(tmpdir), "empty")
+    os.mkdir(emptydir)
+    fake_asyncssh.calls = []
+    local_store[0]._sftp_transfer(emptydir, "empty_directory")
+    assert fake_asyncssh.calls == [
+        ("makedirs", os.path.join(local_store[1], "empty_directory"), True)
+    ]
+
+    # clean up
+    shutil.rmtree(os.path.join(local_store[1]))
+
+    return
+
+
+def test_sftp_transfer_fallback(tmpdir, local_store, fake_asyncssh):
+    # make a fake file in our tmpdir
+    tmppath = os.path.join(str(tmpdir), "my_file.txt")
+    with open(tmppath, "w") as f:
+        print("hello world", file=f)
+
+    # a failed SFTP transfer raises an RPCError
+    fake_asyncssh.put_error = sys.modules["asyncssh"].Error("connection lost")
+    with pytest.raises(RPCError):
+        local_store[0]._sftp_transfer(str(tmpdir), "test_directory")
+
+    # ... which copy_to_store catches to fall back on rsync
+    local_store[0].copy_to_store(str(tmpdir), "test_directory", try_sftp=True)
+
+    dirpath = os.path.join(local_store[1], "test_directory")
+    assert local_store[0]._ssh_slurp("ls {}".format(dirpath)).decode("utf-8") == "my_file.txt\n"
+
+    # clean up
+    shutil.rmtree(os.path.join(local_store[1]))
+
+    return
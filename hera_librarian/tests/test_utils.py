@@ -8,7 +8,6 @@
 
 import pytest
 import os
-import six
 import sys
 import json
 from contextlib import contextmanager
@@ -25,12 +25,14 @@ format_obsid_as_calendar_date
 ''').split()
 
 import hashlib
-import locale
 import os.path
 import re
+import stat
 
 import numpy as np
 
+MD5_CHUNK_SIZE = 1024 * 1024  # bytes read per syscall when computing MD5s
+
 
 def get_type_from_path(path):
     """Get the "file type" from a path.
@@ -328,9 +330,26 @@ def _md5_of_file(path):
     """
     md5 = hashlib.md5()
 
-    with open(path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
-            md5.update(chunk)
+    # Read in big chunks into a single reusable buffer: this keeps the number
+    # of read() syscalls (and allocations) down when checksumming
+    # multi-gigabyte data files.
+    buf = bytearray(MD5_CHUNK_SIZE)
+    view = memoryview(buf)
+
+    with open(path, 'rb', buffering=0) as f:
+        # Tell the kernel we're going to stream through the whole file so it
+        # can read ahead aggressively. Not available on all platforms.
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass  # e.g. unsupported filesystem; it's only a hint
+
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            md5.update(view[:n])
 
     return md5.hexdigest()
 
@@ -378,21 +397,20 @@ def get_md5_from_path(path):
 
     md5 = hashlib.md5()
     plen = len(path)
+    sep = b'  .'  # compat with command-line approach
+    eol = b'\n'
 
-    try:
-        # NOTE: this is not threadsafe. This will *probably* never come back
-        # to bite us in the ass ...
-        prevlocale = locale.getlocale(locale.LC_COLLATE)
-        locale.setlocale(locale.LC_COLLATE, 'C')
-
-        for f in sorted(all_files()):
-            subhash = _md5_of_file(f).encode("utf-8")
-            md5.update(subhash)  # this is the hex digest, like we want
-            md5.update('  .'.encode("utf-8"))  # compat with command-line approach
-            md5.update(f[plen:].encode("utf-8"))
-            md5.update('\n'.encode("utf-8"))
-    finally:
-        locale.setlocale(locale.LC_COLLATE, prevlocale)
+    # Python's sorted() compares strings by code point and ignores the locale,
+    # which for UTF-8 names gives the same order as `LC_ALL=C sort`. So there's
+    # no need to touch the (process-wide) locale here, and this function is
+    # safe to call from multiple threads at once.
+
+    for f in sorted(all_files()):
+        subhash = _md5_of_file(f).encode("utf-8")
+        md5.update(subhash)  # this is the hex digest, like we want
+        md5.update(sep)
+        md5.update(f[plen:].encode("utf-8"))
+        md5.update(eol)
 
     return md5.hexdigest()
 
@@ -404,14 +422,26 @@ def get_size_from_path(path):
     contains.
 
     """
-    if not os.path.isdir(path):
-        return os.path.getsize(path)
+    st = os.stat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        return st.st_size
 
-    size = 0
+    # We use os.scandir() directly rather than os.walk() + os.path.getsize():
+    # the directory entries already tell us what is a subdirectory, so the
+    # only syscall per file is the stat() for its size. To match os.walk(),
+    # we don't descend into symlinks to directories, but we do count the
+    # sizes of the files that symlinks point to.
 
-    for dirname, dirs, files in os.walk(path):
-        for f in files:
-            size += os.path.getsize(dirname + '/' + f)
+    size = 0
+    todo = [path]
+
+    while len(todo):
+        with os.scandir(todo.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    todo.append(entry.path)
+                elif not entry.is_dir():
+                    size += entry.stat().st_size
 
     return size
 
@@ -24,6 +24,16 @@ except DistributionNotFound:
     pass
 
 
+DEFAULT_QUERY_CACHE_SIZE = 2000
+"""SQLAlchemy's default is 500 statements. We keep up to 256 compiled searches
+around (see `search._compile_search_to_clause`), and each of them can be run
+in several shapes -- a listing with a LIMIT, a COUNT, a bare name select, a
+standing order's query with its exclusions -- on top of the server's other
+queries. So we make room for roughly four statements per cached search, at
+a cost of a few megabytes.
+
+"""
+
 _log_level_names = {
     'debug': logging.DEBUG,
     'info': logging.INFO,
@@ -32,8 +42,21 @@ _log_level_names = {
 }
 
 
-def _initialize():
+def _read_config_sync(config_path):
+    """Load the server's JSON configuration file.
+
+    This deliberately uses plain blocking I/O. The file is small and read once
+    at startup, so handing it to an async runtime would only add overhead;
+    please keep it (and similar small reads) synchronous.
+
+    """
     import json
+
+    with open(config_path) as f:
+        return json.load(f)
+
+
+def _initialize():
     import os.path
     from flask import Flask
     from flask_sqlalchemy import SQLAlchemy
@@ -49,8 +72,7 @@ def _initialize():
         )
     config_path = os.environ["LIBRARIAN_CONFIG_PATH"]
     try:
-        with open(config_path) as f:
-            config = json.load(f)
+        config = _read_config_sync(config_path)
     except FileNotFoundError:
         raise ValueError(f"Librarian configuration file {config_path} not found.")
 
@@ -80,6 +102,14 @@ def _initialize():
     if warn_loglevel:
         logger.warn('unrecognized value %r for "log_level" config item', loglevel_cfg)
 
+    # The same search queries get run over and over (e.g. by the standing
+    # order manager), so give SQLAlchemy's compiled-statement cache more room
+    # than its default. Explicit engine options in the config file take
+    # precedence.
+    engine_options = {'query_cache_size': DEFAULT_QUERY_CACHE_SIZE}
+    engine_options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
     tf = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
     app = Flask('librarian', template_folder=tf)
     app.config.update(config)
@@ -309,12 +339,12 @@ def maybe_add_stores():
     know about.
 
     """
+    from sqlalchemy import exists
     from .dbutil import SQLAlchemyError
     from .store import Store
 
     for name, cfg in app.config.get('add-stores', {}).items():
-        prev = Store.query.filter(Store.name == name).first()
-        if prev is None:
+        if not db.session.query(exists().where(Store.name == name)).scalar():
             store = Store(name, cfg['path_prefix'], cfg['ssh_host'])
             store.http_prefix = cfg.get('http_prefix')
             store.available = cfg.get('available', True)
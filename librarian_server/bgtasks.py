@@ -136,15 +136,27 @@ class TaskManager(object):
 
     """
     worker_pool = None
-    """A ThreadPool of workers that can execute the background tasks.
+    """A ThreadPoolExecutor whose workers execute the background tasks. Unlike
+    the multiprocessing ThreadPool we used to use, it only starts threads as
+    tasks are actually submitted, so an idle server doesn't carry around a
+    full complement of worker threads.
 
     """
     last_purge = 0
     """The last time that the `tasks` list was purged."""
 
+    active_uploads_by_order = None
+    """A dict mapping standing order names to Counters of the basenames of files
+    that have upload tasks in flight on behalf of that order. Maintained by
+    `store.UploaderTask` so that the standing order machinery doesn't need to
+    scan the whole task list to find them.
+
+    """
+
     def __init__(self):
         self.tasks = []
         self.last_purge = time.time()
+        self.active_uploads_by_order = {}
 
     def _maybe_purge_tasks(self):
         now = time.time()
@@ -170,8 +182,8 @@ class TaskManager(object):
         It may not be launched immediately if there are a lot of background
         tasks to deal with.
 
-        apply_async() returns a result object, but we're a web service so we
-        can't wait around to see what it is. Instead we run the function in a
+        submit() returns a future, but we're a web service so we can't wait
+        around to see what it is. Instead we run the function in a
         wrapper that uses Tornado's infrastructure to let the main thread know
         what happened to it.
 
@@ -183,22 +195,22 @@ class TaskManager(object):
         task._manager = self
 
         if self.worker_pool is None:
-            import multiprocessing.util
-            multiprocessing.util.log_to_stderr(5)
-            from multiprocessing.pool import ThreadPool
-            self.worker_pool = ThreadPool(app.config.get('n_worker_threads', 8))
+            from concurrent.futures import ThreadPoolExecutor
+            self.worker_pool = ThreadPoolExecutor(
+                max_workers=app.config.get('n_worker_threads', 8),
+                thread_name_prefix='librarian-bgtask',
+            )
 
         task.submit_time = time.time()
         self.tasks.append(task)
-        self.worker_pool.apply_async(_thread_wrapper, (task, IOLoop.current()))
+        self.worker_pool.submit(_thread_wrapper, task, IOLoop.current())
 
     def maybe_wait_for_threads_to_finish(self):
         if self.worker_pool is None:
             return
 
         print('Waiting for background jobs to complete ...')
-        self.worker_pool.close()
-        self.worker_pool.join()
+        self.worker_pool.shutdown(wait=True)
         print('   ... done.')
 
 
@@ -54,13 +54,17 @@ def infer_file_obsid(parent_dirs, name, info):
                 'need to infer obsid of HERA file \"%s\", but its name looks weird', name)
 
         prefix = '.'.join(bits[:3])
+        # We only need to know whether there's exactly one candidate, so
+        # stop looking once we've found a second.
         obsids = list(db.session.query(File.obsid)
                       .filter(File.name.like(prefix + '.%'))
-                      .group_by(File.obsid))
+                      .group_by(File.obsid)
+                      .limit(2))
 
         if len(obsids) != 1:
-            raise ServerError('need to infer obsid of HERA file \"%s\", but got %d candidate '
-                              'obsids from similarly-named files', name, len(obsids))
+            raise ServerError('need to infer obsid of HERA file \"%s\", but got %s candidate '
+                              'obsids from similarly-named files', name,
+                              'no' if not len(obsids) else 'multiple')
 
         return obsids[0]
 
@@ -76,12 +80,13 @@ def infer_file_obsid(parent_dirs, name, info):
             db.session.query(File.obsid)
             .filter(File.name.like(prefix + "_%"))
             .group_by(File.obsid)
+            .limit(2)
         )
 
         if len(obsids) != 1:
             raise ServerError(
-                "need to infer obsid of SO file \"%s\", but got %d candidate obsids from "
-                "similarly-named files", name, len(obsids)
+                "need to infer obsid of SO file \"%s\", but got %s candidate obsids from "
+                "similarly-named files", name, "no" if not len(obsids) else "multiple"
             )
 
         return obsids[0]
@@ -180,6 +185,10 @@ class File (db.Model):
         is done. If *info* is given, we use it; otherwise we SSH into the
         store to gather the info ourselves.
 
+        New records are flushed but not committed: every caller goes on to
+        create a FileInstance and commits everything in one go, which saves a
+        transaction per new file when many files are registered at once.
+
         If *null_obsid* is True, the entry is expected and required to have a
         null obsid. If False (the default), the file must have an obsid --
         either explicitly specified, or inferred from the file contents.
@@ -265,7 +274,7 @@ class File (db.Model):
         db.session.add(fobj)
 
         try:
-            db.session.commit()
+            db.session.flush()
         except SQLAlchemyError:
             db.session.rollback()
             app.log_exception(sys.exc_info())
@@ -273,7 +282,7 @@ class File (db.Model):
 
         return fobj
 
-    def delete_instances(self, mode='standard', restrict_to_store=None):
+    def delete_instances(self, mode='standard', restrict_to_store=None, commit=True):
         """DANGER ZONE! Delete instances of this file on all stores!
 
         We have a safety interlock: each FileInstance has a "deletion_policy"
@@ -291,6 +300,11 @@ class File (db.Model):
         instance. Only instances kept on the specified store will be deleted
         -- all other instances will be kept.
 
+        If `commit` is False, the database changes are left for the caller to
+        commit. This lets a caller deleting instances of many files commit
+        once at the end, rather than expiring every object that it has
+        loaded after each file.
+
         """
         if mode == 'standard':
             noop = False
@@ -354,7 +368,11 @@ class File (db.Model):
                 db.session.delete(inst)
             n_deleted += 1
 
-        if not noop:
+        # Only commit if we actually changed something: committing expires
+        # every object in the session, which would throw away anything our
+        # caller has eagerly loaded.
+
+        if commit and not noop and n_deleted:
             try:
                 db.session.commit()
             except SQLAlchemyError:
@@ -573,7 +591,7 @@ class FileEvent (db.Model):
     payload = db.Column(db.Text)
     file = db.relationship('File', back_populates='events')
 
-    name_index = db.Index('file_event_name', name)
+    name_type_index = db.Index('file_event_name_type', name, type)
 
     def __init__(self, name, type, payload_struct):
         if '/' in name:
@@ -734,12 +752,31 @@ def delete_file_instances_matching_query(args, sourcename=None):
         from .store import Store
         restrict_to_store = Store.get_by_name(restrict_to_store)  # ServerError if lookup fails
 
+    # File.delete_instances() walks each file's instances and their stores;
+    # load those up front with a JOIN rather than lazily, one file at a time.
+
+    from sqlalchemy.orm import joinedload
     from .search import compile_search
-    query = compile_search(query, query_type='files')
+    query = (compile_search(query, query_type='files')
+             .options(joinedload(File.instances).joinedload(FileInstance.store_object)))
     stats = {}
 
+    # We commit once at the end: committing after each file would expire all
+    # of the eagerly loaded objects, and the next file would lazy-load them
+    # again.
+
     for file in query:
-        stats[file.name] = file.delete_instances(mode=mode, restrict_to_store=restrict_to_store)
+        stats[file.name] = file.delete_instances(mode=mode, restrict_to_store=restrict_to_store,
+                                                 commit=False)
+
+    if mode != 'noop' and any(s['n_deleted'] for s in stats.values()):
+        try:
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            app.log_exception(sys.exc_info())
+            raise ServerError(
+                'deleted instances but failed to update database! DB/FS consistency broken!')
 
     return {
         'stats': stats,
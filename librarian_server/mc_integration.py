@@ -24,7 +24,6 @@ register_callbacks
 import time
 
 from astropy.time import Time
-import six
 from sqlalchemy.exc import InvalidRequestError
 
 from . import app, db, is_primary_server, logger
@@ -153,7 +152,7 @@ class MCManager(object):
         # corner cases the bandwidth will get wonky, but we also have the
         # direct measurements from the pots to look at.
 
-        for conn_name, file_sizes in six.iteritems(self._remote_upload_stats):
+        for conn_name, file_sizes in self._remote_upload_stats.items():
             num_file_uploads = len(file_sizes)
             bytes_uploaded = sum(file_sizes)  # this works when the list is empty.
             bandwidth_Mbs = bytes_uploaded * 8 / (1024**2 * (unix_now - self._last_report_time))
@@ -10,8 +10,8 @@ gather_records
 ''').split()
 
 from flask import flash, redirect, render_template, url_for
+from sqlalchemy import exists
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm.exc import NoResultFound
 
 from . import app, db
 from .dbutil import SQLAlchemyError
@@ -83,9 +83,7 @@ def create_records(info, sourcename):
             raise ServerError('new file %s (obsid %s) rejected by M&C; see M&C error logs for the reason',
                               obj.name, obj.obsid)
 
-        try:
-            db.session.query(File).filter_by(name=obj.name).one()
-        except NoResultFound:
+        if not db.session.query(exists().where(File.name == obj.name)).scalar():
             try:
                 db.session.add(obj)
                 db.session.flush()
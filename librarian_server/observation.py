@@ -342,6 +342,18 @@ def assign_observing_sessions(args, sourcename=None):
     new_sess_info = []
     retval = {'new_sessions': new_sess_info}
 
+    query = Observation.query.filter(Observation.session_id == None)
+    if minimum_start_jd is not None:
+        query = query.filter(Observation.start_time_jd >= minimum_start_jd)
+    if maximum_start_jd is not None:
+        query = query.filter(Observation.start_time_jd <= maximum_start_jd)
+
+    # Usually there's nothing to do, in which case we can skip loading all of
+    # the sessions below.
+
+    if not db.session.query(query.exists()).scalar():
+        return retval
+
     # Build a list of all prior sessions so we can see if any Observations
     # must be assigned to preexisting sessions.
 
@@ -351,11 +363,6 @@ def assign_observing_sessions(args, sourcename=None):
     # preexisting one (if they fall inside), or save them for followup.
 
     examine_obs = []
-    query = Observation.query.filter(Observation.session_id == None)
-    if minimum_start_jd is not None:
-        query = query.filter(Observation.start_time_jd >= minimum_start_jd)
-    if maximum_start_jd is not None:
-        query = query.filter(Observation.start_time_jd <= maximum_start_jd)
 
     for obs in query.order_by(Observation.start_time_jd.asc()):
         # TODO: we've got some N^2 scaling here; we could do a better job.
@@ -18,17 +18,26 @@ register_standing_order_checkin
 ''').split()
 
 import datetime
+from functools import lru_cache, partial
 import json
 import logging
 import os.path
-import six
+import re
 import sys
 import time
 
-from flask import Response, flash, redirect, render_template, request, url_for
+from flask import (Response, flash, redirect, render_template, request, stream_with_context,
+                   url_for)
+from sqlalchemy import and_, bindparam, exists, func, literal, not_, or_, select
+from sqlalchemy.orm import validates
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BooleanClauseList
 
 from . import app, db, is_primary_server, logger
 from .dbutil import NotNull, SQLAlchemyError
+from .file import File, FileEvent, FileInstance
+from .observation import Observation, ObservingSession
+from .store import Store
 from .webutil import ServerError, json_api, login_required, optional_arg, required_arg
 
 
@@ -43,13 +52,66 @@ class _AttributeTypes(object):
 
 AttributeTypes = _AttributeTypes()
 
+num_types = (int, float)
+"""The Python types that are acceptable for numeric search payloads."""
+
+
+class _Constant(object):
+    """A search clause whose value is known at compile time. We represent these
+    with sentinels rather than SQL literals so that they can be simplified out
+    of the logical operators that contain them; only a constant that survives
+    to the top level of a search gets turned into SQL.
+
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return '<search constant %r>' % self.value
+
+
+_TRUE = _Constant(True)
+_FALSE = _Constant(False)
+
 
 class GenericSearchCompiler(object):
     """A simple singleton class that helps with compiling searches. The only state
-    that we manage is the list of search clauses, which can be extended
+    that we manage is the tables of search clauses, which can be extended
     dynamically to support different types of attributes that searchable
     things possess.
 
+    There are two tables. `clauses` maps clause names to methods that take the
+    clause name and payload. `attr_clauses` holds the clauses that test an
+    attribute of the searched item; it maps clause names to a tuple of the
+    method implementing the test and a function returning the attribute's
+    SQL expression, which are called directly rather than through a
+    `functools.partial` per clause.
+
+    """
+    _attribute_ops = {
+        AttributeTypes.string: [
+            ('is-exactly', '_do_str_is_exactly'),
+            ('is-not', '_do_str_is_not'),
+            ('matches', '_do_str_matches'),
+        ],
+        AttributeTypes.int: [
+            ('is-exactly', '_do_int_is_exactly'),
+            ('is-not', '_do_int_is_not'),
+            ('greater-than', '_do_num_greater_than'),
+            ('less-than', '_do_num_less_than'),
+            ('in-range', '_do_num_in_range'),
+            ('not-in-range', '_do_num_not_in_range'),
+        ],
+        AttributeTypes.float: [
+            ('greater-than', '_do_num_greater_than'),
+            ('less-than', '_do_num_less_than'),
+            ('in-range', '_do_num_in_range'),
+            ('not-in-range', '_do_num_not_in_range'),
+        ],
+    }
+    """The tests supported for each type of attribute, as pairs of clause name
+    suffix and implementing method name.
+
     """
 
     def __init__(self):
@@ -60,6 +122,7 @@ class GenericSearchCompiler(object):
             'always-true': self._do_always_true,
             'always-false': self._do_always_false,
         }
+        self.attr_clauses = {}
 
     def compile(self, search):
         """Compile a search that is specified as a JSON-like data structure.
@@ -69,54 +132,38 @@ class GenericSearchCompiler(object):
 
         """
         if isinstance(search, dict):
-            return self._compile_clause('and', search)
+            clause = self._compile_clause('and', search)
+            if isinstance(clause, _Constant):
+                return literal(clause.value)
+            return clause
 
         raise ServerError('can\'t parse search: data must '
                           'be in dict format; got %s', search.__class__.__name__)
 
     def _compile_clause(self, name, payload):
         impl = self.clauses.get(name)
-        if impl is None:
+        if impl is not None:
+            return impl(name, payload)
+
+        attr_clause = self.attr_clauses.get(name)
+        if attr_clause is None:
             raise ServerError('can\'t parse search: unrecognized clause %r' % name)
-        return impl(name, payload)
+
+        impl, attr_getter = attr_clause
+        return impl(attr_getter, name, payload)
 
     # Framework for doing searches on general attributes of database items.
 
     def _add_attributes(self, cls, attr_info):
-        from functools import partial
-
         for attr_name, attr_type, attr_getter in attr_info:
             clause_name = attr_name.replace('_', '-')
 
             if attr_getter is None:
                 attr_getter = partial(getattr, cls, attr_name)
 
-            if attr_type == AttributeTypes.string:
-                self.clauses[clause_name +
-                             '-is-exactly'] = partial(self._do_str_is_exactly, attr_getter)
-                self.clauses[clause_name + '-is-not'] = partial(self._do_str_is_not, attr_getter)
-                self.clauses[clause_name + '-matches'] = partial(self._do_str_matches, attr_getter)
-            elif attr_type == AttributeTypes.int:
-                self.clauses[clause_name +
-                             '-is-exactly'] = partial(self._do_int_is_exactly, attr_getter)
-                self.clauses[clause_name + '-is-not'] = partial(self._do_int_is_not, attr_getter)
-                self.clauses[clause_name +
-                             '-greater-than'] = partial(self._do_num_greater_than, attr_getter)
-                self.clauses[clause_name +
-                             '-less-than'] = partial(self._do_num_less_than, attr_getter)
-                self.clauses[clause_name +
-                             '-in-range'] = partial(self._do_num_in_range, attr_getter)
-                self.clauses[clause_name +
-                             '-not-in-range'] = partial(self._do_num_not_in_range, attr_getter)
-            elif attr_type == AttributeTypes.float:
-                self.clauses[clause_name +
-                             '-greater-than'] = partial(self._do_num_greater_than, attr_getter)
-                self.clauses[clause_name +
-                             '-less-than'] = partial(self._do_num_less_than, attr_getter)
-                self.clauses[clause_name +
-                             '-in-range'] = partial(self._do_num_in_range, attr_getter)
-                self.clauses[clause_name +
-                             '-not-in-range'] = partial(self._do_num_not_in_range, attr_getter)
+            for suffix, method_name in self._attribute_ops[attr_type]:
+                self.attr_clauses[clause_name + '-' + suffix] = (getattr(self, method_name),
+                                                                 attr_getter)
 
     def _do_str_matches(self, attr_getter, clause_name, payload):
         if not isinstance(payload, str):
@@ -149,87 +196,152 @@ class GenericSearchCompiler(object):
         return (attr_getter() != payload)
 
     def _do_num_greater_than(self, attr_getter, clause_name, payload):
-        if not isinstance(payload, (int, float)):
+        if not isinstance(payload, num_types):
             raise ServerError('can\'t parse "%s" clause: contents must be numeric, '
                               'but got %s', clause_name, payload.__class__.__name__)
         return (attr_getter() > payload)
 
     def _do_num_less_than(self, attr_getter, clause_name, payload):
-        if not isinstance(payload, (int, float)):
+        if not isinstance(payload, num_types):
             raise ServerError('can\'t parse "%s" clause: contents must be numeric, '
                               'but got %s', clause_name, payload.__class__.__name__)
         return (attr_getter() < payload)
 
-    def _do_num_in_range(self, attr_getter, clause_name, payload):
+    def _validate_num_pair(self, clause_name, payload):
+        """Check that *payload* is a list of two numbers, returning them in
+        increasing order.
+
+        """
         if (not isinstance(payload, list) or
             len(payload) != 2 or
-            not isinstance(payload[0], (int, float)) or
-                not isinstance(payload[1], (int, float))):
+            not isinstance(payload[0], num_types) or
+                not isinstance(payload[1], num_types)):
             raise ServerError('can\'t parse "%s" clause: contents must be a list of two numbers, '
                               'but got %s', clause_name, payload.__class__.__name__)
 
         v1, v2 = payload
         if v1 > v2:
-            v1, v2 = v2, v1
+            return v2, v1
+        return v1, v2
 
-        from sqlalchemy import and_
+    def _do_num_in_range(self, attr_getter, clause_name, payload):
+        v1, v2 = self._validate_num_pair(clause_name, payload)
         value = attr_getter()
         return and_(value >= v1, value <= v2)
 
     def _do_num_not_in_range(self, attr_getter, clause_name, payload):
-        if (not isinstance(payload, list) or
-            len(payload) != 2 or
-            not isinstance(payload[0], (int, float)) or
-                not isinstance(payload[1], (int, float))):
-            raise ServerError('can\'t parse "%s" clause: contents must be a list of two numbers, '
-                              'but got %s', clause_name, payload.__class__.__name__)
-
-        v1, v2 = payload
-        if v1 > v2:
-            v1, v2 = v2, v1
-
-        from sqlalchemy import or_
+        v1, v2 = self._validate_num_pair(clause_name, payload)
         value = attr_getter()
         return or_(value < v1, value > v2)
 
     # Custom, generic clauses.
 
-    def _do_and(self, clause_name, payload):
+    simplify_operands = True
+    """Whether to remove duplicated sub-clauses from logical operators, and merge
+    nested ANDs and ORs into their parents. Turning this off is handy when
+    debugging the compiler, since the SQL then mirrors the search exactly.
+
+    """
+
+    def _operand_key(self, name, payload):
+        """Return a hashable key identifying a sub-clause, such that sub-clauses
+        with the same key compile to the same thing. Aliases of attribute
+        clauses share their implementation, so they share keys too.
+
+        """
+        attr_clause = self.attr_clauses.get(name)
+        if attr_clause is not None:
+            name = attr_clause
+        return (name, json.dumps(payload, sort_keys=True))
+
+    def _compile_operands(self, clause_name, payload, absorbing):
+        """Compile the sub-clauses of a logical operator, dropping those that are
+        constants with no effect on the result. If any of the sub-clauses is
+        the `absorbing` constant, that constant is returned; otherwise, a
+        list of the remaining sub-clauses is.
+
+        """
         if not isinstance(payload, dict) or not len(payload):
             raise ServerError('can\'t parse "%s" clause: contents must be a dict, '
                               'but got %s', clause_name, payload.__class__.__name__)
-        from sqlalchemy import and_
-        return and_(*[self._compile_clause(*t) for t in payload.items()])
+
+        if self.simplify_operands:
+            seen = set()
+            operands = []
+
+            for name, sub_payload in payload.items():
+                key = self._operand_key(name, sub_payload)
+                if key not in seen:
+                    seen.add(key)
+                    operands.append(self._compile_clause(name, sub_payload))
+        else:
+            operands = [self._compile_clause(*t) for t in payload.items()]
+
+        # Note that we need to use identity tests here: comparing SQL
+        # expressions with "==" builds a new expression.
+
+        if any(c is absorbing for c in operands):
+            return absorbing
+        return [c for c in operands if not isinstance(c, _Constant)]
+
+    def _flatten_operands(self, operands, operator):
+        """Merge sub-clauses that are themselves ANDs (or ORs, according to
+        `operator`) into the list of their parent's operands.
+
+        """
+        if not self.simplify_operands:
+            return operands
+
+        flattened = []
+
+        for c in operands:
+            if isinstance(c, BooleanClauseList) and c.operator is operator:
+                flattened.extend(c.clauses)
+            else:
+                flattened.append(c)
+
+        return flattened
+
+    def _do_and(self, clause_name, payload):
+        operands = self._compile_operands(clause_name, payload, _FALSE)
+        if operands is _FALSE:
+            return _FALSE
+        if not len(operands):
+            return _TRUE
+        if len(operands) == 1:
+            return operands[0]
+        return and_(*self._flatten_operands(operands, operators.and_))
 
     def _do_or(self, clause_name, payload):
-        if not isinstance(payload, dict) or not len(payload):
-            raise ServerError('can\'t parse "%s" clause: contents must be a dict, '
-                              'but got %s', clause_name, payload.__class__.__name__)
-        from sqlalchemy import or_
-        return or_(*[self._compile_clause(*t) for t in payload.items()])
+        operands = self._compile_operands(clause_name, payload, _TRUE)
+        if operands is _TRUE:
+            return _TRUE
+        if not len(operands):
+            return _FALSE
+        if len(operands) == 1:
+            return operands[0]
+        return or_(*self._flatten_operands(operands, operators.or_))
 
     def _do_none_of(self, clause_name, payload):
-        if not isinstance(payload, dict) or not len(payload):
-            raise ServerError('can\'t parse "%s" clause: contents must be a dict, '
-                              'but got %s', clause_name, payload.__class__.__name__)
-        from sqlalchemy import not_, or_
-        return not_(or_(*[self._compile_clause(*t) for t in payload.items()]))
+        clause = self._do_or(clause_name, payload)
+        if clause is _TRUE:
+            return _FALSE
+        if clause is _FALSE:
+            return _TRUE
+        return not_(clause)
 
     def _do_always_true(self, clause_name, payload):
         """We just ignore the payload."""
-        from sqlalchemy import literal
-        return literal(True)
+        return _TRUE
 
     def _do_always_false(self, clause_name, payload):
         """We just ignore the payload."""
-        from sqlalchemy import literal
-        return literal(False)
+        return _FALSE
 
 
 # Searches for observing sessions
 
 def _session_get_id():
-    from .observation import ObservingSession
     return ObservingSession.id
 
 
@@ -240,30 +352,32 @@ def _session_get_duration():
     any files if we try to search that way.
 
     """
-    from .observation import ObservingSession
     return (ObservingSession.stop_time_jd - ObservingSession.start_time_jd)
 
 
 def _session_get_num_obs():
-    from sqlalchemy import func
-    from .observation import Observation, ObservingSession
     return (db.session.query(func.count(Observation.obsid))
             .filter(Observation.session_id == ObservingSession.id).as_scalar())
 
 
 def _session_get_num_files():
-    from sqlalchemy import func
-    from .file import File
-    from .observation import Observation, ObservingSession
     return (db.session.query(func.count(File.name))
             .filter(File.obsid == Observation.obsid)
             .filter(Observation.session_id == ObservingSession.id).as_scalar())
 
 
-def _session_get_age():
+def _now_jd():
     from astropy.time import Time
-    from .observation import ObservingSession
-    return (Time.now().jd - ObservingSession.stop_time_jd)
+    return Time.now().jd
+
+
+def _session_get_age():
+    """The current time is bound as a parameter that is evaluated when the query is
+    executed, not when the search is compiled, so that compiled searches can be
+    cached and reused.
+
+    """
+    return (bindparam(None, callable_=_now_jd, type_=db.Float) - ObservingSession.stop_time_jd)
 
 
 simple_session_attrs = [
@@ -279,7 +393,6 @@ simple_session_attrs = [
 
 class ObservingSessionSearchCompiler(GenericSearchCompiler):
     def __init__(self):
-        from .observation import ObservingSession
         super(ObservingSessionSearchCompiler, self).__init__()
         self._add_attributes(ObservingSession, simple_session_attrs)
 
@@ -290,10 +403,6 @@ class ObservingSessionSearchCompiler(GenericSearchCompiler):
             raise ServerError('can\'t parse "%s" clause: contents must be text, '
                               'but got %s', clause_name, payload.__class__.__name__)
 
-        from sqlalchemy import func
-        from .file import File, FileEvent
-        from .observation import Observation, ObservingSession
-
         # This feels awfully gross, but it works.
 
         return (db.session.query(func.count(File.name))
@@ -316,21 +425,14 @@ def _obs_get_duration():
     files if we try to search that way.
 
     """
-    from .observation import Observation
     return (Observation.stop_time_jd - Observation.start_time_jd)
 
 
 def _obs_get_num_files():
-    from sqlalchemy import func
-    from .file import File
-    from .observation import Observation
     return db.session.query(func.count(File.name)).filter(File.obsid == Observation.obsid).as_scalar()
 
 
 def _obs_get_total_size():
-    from sqlalchemy import func
-    from .file import File
-    from .observation import Observation
     return db.session.query(func.sum(File.size)).filter(File.obsid == Observation.obsid).as_scalar()
 
 
@@ -348,7 +450,6 @@ simple_obs_attrs = [
 
 class ObservationSearchCompiler(GenericSearchCompiler):
     def __init__(self):
-        from .observation import Observation
         super(ObservationSearchCompiler, self).__init__()
         self._add_attributes(Observation, simple_obs_attrs)
 
@@ -359,8 +460,6 @@ the_obs_search_compiler = ObservationSearchCompiler()
 # Searches for files
 
 def _file_get_num_instances():
-    from sqlalchemy import func
-    from .file import File, FileInstance
     return db.session.query(func.count()).filter(FileInstance.name == File.name).as_scalar()
 
 
@@ -374,15 +473,49 @@ simple_file_attrs = [
 ]
 
 
+def _days_ago(days):
+    """Return an SQL expression for the UTC time *days* days ago.
+
+    Where we know how, the current time comes from the database itself; this
+    keeps the value out of the compiled query, so that compiled searches can
+    be cached and reused. File creation times are naive UTC datetimes, so
+    that's what we need to compare against. For other databases, we bind a
+    parameter that is evaluated when the query is executed.
+
+    """
+    dialect = db.engine.dialect.name
+
+    if dialect == 'sqlite':
+        modifier = bindparam(None, '%+f days' % -float(days), type_=db.String)
+        return func.datetime('now', modifier)
+
+    if dialect == 'postgresql':
+        seconds = bindparam(None, float(days) * 86400, type_=db.Float)
+        return func.timezone('utc', func.now()) - func.make_interval(0, 0, 0, 0, 0, 0, seconds)
+
+    def days_ago(days):
+        return datetime.datetime.utcnow() - datetime.timedelta(days=days)
+
+    return bindparam(None, callable_=partial(days_ago, days), type_=db.DateTime)
+
+
+_OBS_PROXY_PREFIXES = ('start-time-jd', 'stop-time-jd', 'start-lst-hr', 'session-id')
+"""Observation search clauses starting with these prefixes can be used directly
+in file searches.
+
+"""
+
+MAX_OBS_SUB_QUERY_CACHE = 128
+
+
 class FileSearchCompiler(GenericSearchCompiler):
     def __init__(self):
-        from .file import File
         super(FileSearchCompiler, self).__init__()
         self._add_attributes(File, simple_file_attrs)
         self.clauses['obs-matches'] = self._do_obs_matches
 
-        self.clauses['name-like'] = self.clauses['name-matches']  # compat alias
-        self.clauses['source-is'] = self.clauses['source-is-exactly']  # compat alias
+        self.attr_clauses['name-like'] = self.attr_clauses['name-matches']  # compat alias
+        self.attr_clauses['source-is'] = self.attr_clauses['source-is-exactly']  # compat alias
 
         self.clauses['obsid-is-null'] = self._do_obsid_is_null
 
@@ -390,11 +523,9 @@ class FileSearchCompiler(GenericSearchCompiler):
         # users aren't going to want to jump through extra hoops to query for
         # them, so we proxy the query clauses.
 
-        from functools import partial
-        for pfx in ('start-time-jd', 'stop-time-jd', 'start-lst-hr', 'session-id'):
-            for cname in six.iterkeys(the_obs_search_compiler.clauses):
-                if cname.startswith(pfx):
-                    self.clauses[cname] = self._do_obs_sub_query
+        for cname in the_obs_search_compiler.attr_clauses:
+            if cname.startswith(_OBS_PROXY_PREFIXES):
+                self.clauses[cname] = self._do_obs_sub_query
 
         # I named these in a very ... weird way.
         self.clauses['not-older-than'] = self._do_not_older_than
@@ -402,64 +533,84 @@ class FileSearchCompiler(GenericSearchCompiler):
 
     def _do_obsid_is_null(self, clause_name, payload):
         """We just ignore the payload."""
-        from .file import File
         return (File.obsid == None)
 
     def _do_not_older_than(self, clause_name, payload):
-        if not isinstance(payload, (int, float)):
+        if not isinstance(payload, num_types):
             raise ServerError('can\'t parse "%s" clause: contents must be '
                               'numeric, but got %s', clause_name, payload.__class__.__name__)
 
-        from .file import File
-        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=payload)
-        return (File.create_time > cutoff)
+        return (File.create_time > _days_ago(payload))
 
     def _do_not_newer_than(self, clause_name, payload):
-        if not isinstance(payload, (int, float)):
+        if not isinstance(payload, num_types):
             raise ServerError('can\'t parse "%s" clause: contents must be '
                               'numeric, but got %s', clause_name, payload.__class__.__name__)
 
-        from .file import File
-        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=payload)
-        return (File.create_time < cutoff)
+        return (File.create_time < _days_ago(payload))
 
     def _do_obs_matches(self, clause_name, payload):
-        from .observation import Observation
-        from .file import File
-
         matched_obsids = (db.session.query(Observation.obsid)
                           .filter(the_obs_search_compiler.compile(payload)))
         return File.obsid.in_(matched_obsids)
 
     def _do_obs_sub_query(self, clause_name, payload):
-        from .observation import Observation
-        from .file import File
+        # Payloads come from JSON, so they can always be serialized back to
+        # it to get a hashable key.
+        return _compile_obs_sub_query(clause_name, json.dumps(payload, sort_keys=True))
 
-        matched_obsids = (db.session.query(Observation.obsid)
-                          .filter(the_obs_search_compiler._compile_clause(clause_name, payload)))
-        return File.obsid.in_(matched_obsids)
+
+@lru_cache(maxsize=MAX_OBS_SUB_QUERY_CACHE)
+def _compile_obs_sub_query(clause_name, canonical_payload):
+    """Compile a proxied observation clause into a file search clause. The same
+    proxied clauses tend to crop up in many different searches, so we memoize
+    them.
+
+    """
+    clause = the_obs_search_compiler._compile_clause(clause_name, json.loads(canonical_payload))
+    return File.obsid.in_(select(Observation.obsid).where(clause))
 
 
 the_file_search_compiler = FileSearchCompiler()
 
+_search_compilers = {
+    'files': the_file_search_compiler,
+    'names': the_file_search_compiler,
+    'obs': the_obs_search_compiler,
+    'sessions': the_session_search_compiler,
+    'instances-stores': the_file_search_compiler,
+    'instances': the_file_search_compiler,
+}
 
-def compile_search(search_string, query_type='files'):
-    """This function returns a query on the File table that will return the File
-    items matching the search.
+
+_COMMENT_RE = re.compile(r'("(?:[^"\\\n]|\\.)*")|#[^\n]*')
+"""Matches either a JSON string literal (captured) or a #-delimited comment.
+Substituting the capture group strips the comments in one pass while leaving
+hash marks inside strings alone.
+
+"""
+
+
+@lru_cache(maxsize=256)
+def _compile_search_to_clause(search_string, query_type):
+    """Parse and compile a search, returning the SQL clause that it corresponds
+    to.
+
+    The same searches get compiled over and over -- most notably, every
+    standing order each time the standing order manager runs -- so we memoize
+    the result. This is safe because the clauses don't depend on anything
+    besides the search text: time-dependent clauses bind the current time at
+    query execution time, not here.
 
     """
-    from .file import File, FileInstance
-    from .observation import Observation, ObservingSession
-    from .store import Store
+    compiler = _search_compilers.get(query_type)
+    if compiler is None:
+        raise ServerError('unhandled query_type %r', query_type)
 
     # As a convenience, we strip out #-delimited comments from the input text.
     # The default JSON parser doesn't accept them, but they're nice for users.
 
-    def filter_comments():
-        for line in search_string.splitlines():
-            yield line.split('#', 1)[0]
-
-    search_string = '\n'.join(filter_comments())
+    search_string = _COMMENT_RE.sub(r'\1', search_string)
 
     # Parse JSON.
 
@@ -469,27 +620,49 @@ def compile_search(search_string, query_type='files'):
         app.log_exception(sys.exc_info())
         raise ServerError('can\'t parse search as JSON: %s', e)
 
-    # Offload to the helper classes.
+    # Offload to the helper classes. Searches that only differ in their
+    # formatting, comments, or clause order -- or in the query type, if it
+    # uses the same compiler -- share a single compiled clause, so we key that
+    # cache on a canonical serialization of the parsed search.
+
+    return _compile_canonical_search(compiler, json.dumps(search, sort_keys=True))
+
+
+@lru_cache(maxsize=256)
+def _compile_canonical_search(compiler, canonical_search):
+    return compiler.compile(json.loads(canonical_search))
+
+
+def compile_search(search_string, query_type='files'):
+    """This function returns a query on the File table that will return the File
+    items matching the search.
+
+    For the "names" query type, the result is instead a plain SQLAlchemy Core
+    `select()` of the matching file names, which can be executed without any
+    ORM overhead or used as a subquery.
+
+    """
+    clause = _compile_search_to_clause(search_string, query_type)
 
     if query_type == 'files':
-        return File.query.filter(the_file_search_compiler.compile(search))
+        return File.query.filter(clause)
     elif query_type == 'names':
-        return db.session.query(File.name).filter(the_file_search_compiler.compile(search))
+        return select(File.name).where(clause)
     elif query_type == 'obs':
-        return Observation.query.filter(the_obs_search_compiler.compile(search))
+        return Observation.query.filter(clause)
     elif query_type == 'sessions':
-        return ObservingSession.query.filter(the_session_search_compiler.compile(search))
+        return ObservingSession.query.filter(clause)
     elif query_type == 'instances-stores':
         # The following syntax gives us a LEFT OUTER JOIN which is what we want to
         # get (at most) one instance for each File of interest.
         return (db.session.query(FileInstance, File, Store)
                 .join(Store)
                 .join(File, isouter=True)
-                .filter(the_file_search_compiler.compile(search)))
+                .filter(clause))
     elif query_type == 'instances':
         return (db.session.query(FileInstance)
                 .join(File, isouter=True)
-                .filter(the_file_search_compiler.compile(search)))
+                .filter(clause))
     else:
         raise ServerError('unhandled query_type %r', query_type)
 
@@ -498,6 +671,12 @@ def compile_search(search_string, query_type='files'):
 
 stord_logger = logging.getLogger('librarian.standingorders')
 
+MAX_SQL_LAUNCHED_EXCLUSIONS = 500
+"""If a standing order has more than this many copies in flight, we exclude their
+files from its search in Python rather than with a giant SQL "NOT IN" clause.
+
+"""
+
 
 class StandingOrder(db.Model):
     """A StandingOrder describes a rule for copying data from this Librarian to
@@ -517,72 +696,111 @@ class StandingOrder(db.Model):
     search = NotNull(db.Text)
     conn_name = NotNull(db.String(64))
 
+    _compiled_search = None
+    """The SQL clause that `search` compiles to. Not stored in the database;
+    computed on demand and reset whenever `search` changes.
+
+    """
+
     def __init__(self, name, search, conn_name):
         self.name = name
         self.search = search
         self.conn_name = conn_name
         self._validate()
 
+    @validates('search')
+    def _reset_compiled_search(self, key, value):
+        self._compiled_search = None
+        return value
+
+    def _get_compiled_search(self):
+        if self._compiled_search is None:
+            # will raise a ServerError if there's a problem.
+            self._compiled_search = _compile_search_to_clause(self.search, 'files')
+        return self._compiled_search
+
     def _validate(self):
         """Check that this object's fields follow our invariants.
 
         """
-        compile_search(self.search)  # will raise a ServerError if there's a problem.
+        self._get_compiled_search()
 
     @property
     def event_type(self):
         return 'standing_order_succeeded:' + self.name
 
-    def get_files_to_copy(self):
+    def get_files_to_copy(self, launched_names=None):
         """Generate a list of files that ought to be copied, according to the
         specifications of this StandingOrder.
 
-        """
-        from .file import File, FileEvent
+        If provided, *launched_names* is a collection of names of files that have
+        copy tasks in flight on behalf of this order; otherwise we get them
+        from the background task manager.
 
+        """
         # The core query is something freeform specified by the user.
 
-        query = compile_search(self.search)
+        query = File.query.filter(self._get_compiled_search())
 
         # We then layer on a check that the files don't have the specified
         # marker event.
 
-        already_done = (db.session.query(File.name)
-                        .filter(FileEvent.name == File.name,
-                                FileEvent.type == self.event_type))
-        query = query.filter(~File.name.in_(already_done))
+        already_done = (exists()
+                        .where(FileEvent.name == File.name)
+                        .where(FileEvent.type == self.event_type))
+        query = query.filter(~already_done)
 
         # Finally we filter out files that already have copy tasks associated
         # with this standing order, exceping those tasks that encountered an
-        # error.
+        # error. We have the database do this unless there are so many such
+        # files that the query would get unwieldy.
 
-        from .store import UploaderTask
-        from .bgtasks import the_task_manager
+        if launched_names is None:
+            launched_names = _get_launched_names_by_order().get(self.name, set())
 
-        already_launched = set(os.path.basename(t.store_path)
-                               for t in the_task_manager.tasks
-                               if (isinstance(t, UploaderTask) and
-                                   self.name == t.standing_order_name and
-                                   t.exception is None))
+        if len(launched_names) <= MAX_SQL_LAUNCHED_EXCLUSIONS:
+            if len(launched_names):
+                query = query.filter(File.name.notin_(list(launched_names)))
+            yield from query
+            return
 
         for file in query:
-            if file.name not in already_launched:
+            if file.name not in launched_names:
                 yield file
 
-    def maybe_launch_copies(self):
+    def maybe_launch_copies(self, launched_names=None):
         """Launch any file copy operations that need to happen according to this
-        StandingOrder's specification.
+        StandingOrder's specification. *launched_names* is as in
+        `get_files_to_copy`.
 
         """
-        from .store import launch_copy_by_file_name
+        from .store import launch_copies_by_file_names
         stord_logger.debug('evaluating standing order %s', self.name)
 
-        for file in self.get_files_to_copy():
+        names = []
+        for file in self.get_files_to_copy(launched_names=launched_names):
             stord_logger.debug('got a hit: %s', file.name)
-            if launch_copy_by_file_name(file.name, self.conn_name,
-                                        standing_order_name=self.name, no_instance='return'):
-                stord_logger.warn('standing order %s should copy file %s to %s, but no instances '
-                                  'of it are available', self.name, file.name, self.conn_name)
+            names.append(file.name)
+
+        if not len(names):
+            return
+
+        for name in launch_copies_by_file_names(names, self.conn_name,
+                                                standing_order_name=self.name):
+            stord_logger.warn('standing order %s should copy file %s to %s, but no instances '
+                              'of it are available', self.name, name, self.conn_name)
+
+
+def _get_launched_names_by_order():
+    """Return a dict mapping standing order names to Counters of the names of
+    files that have copy tasks in flight on behalf of that order. The task
+    manager keeps this index up to date as uploads are launched and finish,
+    so we don't need to scan the background task list for it. The result
+    must not be modified.
+
+    """
+    from .bgtasks import the_task_manager
+    return the_task_manager.active_uploads_by_order
 
 
 # A simple little manager for running standing orders. We have a timeout to
@@ -659,8 +877,10 @@ class StandingOrderManager(object):
         stord_logger.debug('running searches')
         self.last_check = now
 
+        launched_names = _get_launched_names_by_order()
+
         for storder in StandingOrder.query.all():
-            storder.maybe_launch_copies()
+            storder.maybe_launch_copies(launched_names=launched_names.get(storder.name, set()))
 
         return True
 
@@ -826,7 +1046,7 @@ class StagerTask(bgtasks.BackgroundTask):
 
         subprocess.check_output(
             argv,
-            stdin=open(os.devnull, 'rb'),
+            stdin=subprocess.DEVNULL,
             stderr=subprocess.STDOUT,
             shell=False,
             close_fds=True,
@@ -882,9 +1102,7 @@ def launch_stage_operation(user, search, stage_dest):
     """
     import os.path
     import pwd
-    from .file import File, FileInstance
     from .misc import ensure_dirs_gw
-    from .store import Store
 
     lds_info = app.config['local_disk_staging']
 
@@ -1109,6 +1327,57 @@ human_obs_format = 'List of observations'
 human_session_format = 'List of sessions'
 stage_the_files_human_format = 'stage-the-files-human'
 
+STREAM_BATCH_SIZE = 1000
+"""The number of rows to fetch from the database at a time when streaming
+plain-text search results.
+
+"""
+
+
+def _stream_lines(lines):
+    """Generate the newline-separated text made up of *lines*, in chunks of
+    STREAM_BATCH_SIZE lines.
+
+    Under Werkzeug, this lets long plain-text results be sent as they're
+    fetched. Tornado's WSGIContainer, which we use in production, collects
+    all of the chunks before sending anything, so there the whole body still
+    ends up in memory; yielding one chunk per batch rather than per line at
+    least keeps it from also holding millions of tiny strings.
+
+    """
+    from itertools import islice
+
+    lines = iter(lines)
+    sep = ''
+
+    while True:
+        batch = list(islice(lines, STREAM_BATCH_SIZE))
+        if not len(batch):
+            return
+
+        yield sep + '\n'.join(batch)
+        sep = '\n'
+
+
+MAX_RESULTS_UI = 500
+"""The maximum number of results to list in the human-readable search outputs.
+
+"""
+
+
+def _limited_results(search):
+    """Return a list of at most MAX_RESULTS_UI results of *search*, and the total
+    number of results. We only need to count the results separately if the
+    listing was truncated.
+
+    """
+    items = search.limit(MAX_RESULTS_UI).all()
+
+    if len(items) < MAX_RESULTS_UI:
+        return items, len(items)
+
+    return items, search.order_by(None).count()
+
 
 @app.route('/search', methods=['GET', 'POST'])
 @login_required
@@ -1143,6 +1412,8 @@ def execute_search_ui():
         query_type = 'names'
     elif output_format == file_name_format:
         for_humans = False
+        if query_type == 'files':
+            query_type = 'names'  # same results, but no need to load File objects
     elif output_format == human_file_format:
         for_humans = True
     elif output_format == human_obs_format:
@@ -1169,38 +1440,56 @@ def execute_search_ui():
     try:
         search = compile_search(search_text, query_type=query_type)
 
+        # For the plain-text outputs, we fetch bare columns with Core selects,
+        # and stream the results in batches. The statements are executed here,
+        # so that database errors are still reported below rather than in the
+        # middle of the response.
+
         if output_format == full_path_format:
-            from .file import FileInstance
-            instances = FileInstance.query.filter(FileInstance.name.in_(search))
-            text = '\n'.join(i.full_path_on_store() for i in instances)
+            rows = db.session.execute(
+                select(Store.path_prefix, FileInstance.parent_dirs, FileInstance.name)
+                .join_from(FileInstance, Store, FileInstance.store == Store.id)
+                .where(FileInstance.name.in_(search))
+                .execution_options(yield_per=STREAM_BATCH_SIZE)
+            )
+            text = stream_with_context(_stream_lines(os.path.join(*row) for row in rows))
+        elif output_format == file_name_format and query_type == 'names':
+            names = db.session.execute(
+                search.execution_options(yield_per=STREAM_BATCH_SIZE)
+            ).scalars()
+            text = stream_with_context(_stream_lines(names))
         elif output_format == file_name_format:
-            text = '\n'.join(f.name for f in search)
+            rows = iter(search.enable_eagerloads(False).yield_per(STREAM_BATCH_SIZE))
+            text = stream_with_context(_stream_lines(f.name for f in rows))
         elif output_format == human_file_format:
-            files = list(search)
+            files, n_total = _limited_results(search)
 
             text = render_template(
                 'search-results-file.html',
-                title='Search Results: %d Files' % len(files),
+                title='Search Results: %d Files' % n_total,
                 search_text=search_text,
                 files=files,
+                n_total=n_total,
                 error_message=None,
             )
         elif output_format == human_obs_format:
-            obs = list(search)
+            obs, n_total = _limited_results(search)
             text = render_template(
                 'search-results-obs.html',
-                title='Search Results: %d Observations' % len(obs),
+                title='Search Results: %d Observations' % n_total,
                 search_text=search_text,
                 obs=obs,
+                n_total=n_total,
                 error_message=None,
             )
         elif output_format == human_session_format:
-            sess = list(search)
+            sess, n_total = _limited_results(search)
             text = render_template(
                 'search-results-session.html',
-                title='Search Results: %d Sessions' % len(sess),
+                title='Search Results: %d Sessions' % n_total,
                 search_text=search_text,
                 sess=sess,
+                n_total=n_total,
                 error_message=None,
             )
         elif output_format == stage_the_files_human_format:
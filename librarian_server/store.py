@@ -25,7 +25,10 @@ UploaderTask
 OffloaderTask
 ''').split()
 
+from collections import Counter
 import os.path
+import sys
+import time
 
 from flask import flash, redirect, render_template, url_for
 
@@ -36,6 +39,14 @@ from .dbutil import NotNull, SQLAlchemyError
 from .webutil import ServerError, json_api, login_required, optional_arg, required_arg
 
 
+# Store ORM objects only live as long as the request that loaded them, so the
+# per-instance space cache in BaseStore never gets reused on the server. We keep
+# our own cache, keyed by store name, that persists across requests.
+
+SPACE_INFO_LIFETIME = 30  # seconds
+_space_info_cache = {}  # store name => (monotonic timestamp, info dict)
+
+
 class Store(db.Model, BaseStore):
     """A Store is a computer with a disk where we can store data. Several of the
     things we keep track of regarding stores are essentially configuration
@@ -80,6 +91,21 @@ class Store(db.Model, BaseStore):
         """
         return BaseStore(self.name, self.path_prefix, self.ssh_host)
 
+    def get_space_info(self):
+        """Like `BaseStore.get_space_info`, but with a cache shared by every Store
+        object with this name, so that repeated requests don't each SSH into
+        the store.
+
+        """
+        now = time.monotonic()
+        cached = _space_info_cache.get(self.name)
+        if cached is not None and now - cached[0] < SPACE_INFO_LIFETIME:
+            return dict(cached[1])
+
+        info = BaseStore.get_space_info(self)
+        _space_info_cache[self.name] = (now, info)
+        return dict(info)
+
     def to_dict(self):
         """This function is currently only used for the /api/probe_stores command,
         so it's a bit limited. That could be changed.
@@ -356,6 +382,14 @@ def complete_upload(args, sourcename=None):
     return {}
 
 
+REGISTER_BATCH_SIZE = 500
+"""The maximum number of file names that `register_instances` looks up in a single
+query. Older versions of SQLite allow at most 999 bound parameters per
+statement.
+
+"""
+
+
 @app.route('/api/register_instances', methods=['GET', 'POST'])
 @json_api
 def register_instances(args, sourcename=None):
@@ -384,21 +418,45 @@ def register_instances(args, sourcename=None):
     store = Store.get_by_name(store_name)  # ServerError if failure
     slashed_prefix = store.path_prefix + '/'
 
-    # Sort the files to get the creation times to line up.
-
-    for full_path in sorted(file_info.keys()):
+    for full_path in file_info.keys():
         if not full_path.startswith(slashed_prefix):
             raise ServerError('file path %r should start with "%s"',
                               full_path, slashed_prefix)
 
+    # Figure out which of these instances we already know about. We do this
+    # with one query up front rather than one query per file, since people
+    # register whole nights' worth of files at once.
+
+    # The names are looked up in batches so that we don't exceed the database's
+    # limit on the number of bound parameters in one statement.
+
+    names = sorted(set(os.path.basename(p) for p in file_info.keys()))
+    known_instances = set()
+
+    for i in range(0, len(names), REGISTER_BATCH_SIZE):
+        known_instances.update(
+            (parent_dirs, name) for parent_dirs, name in
+            (db.session.query(FileInstance.parent_dirs, FileInstance.name)
+             .filter(FileInstance.store == store.id)
+             .filter(FileInstance.name.in_(names[i:i + REGISTER_BATCH_SIZE])))
+        )
+
+    # Sort the files to get the creation times to line up. The new instances
+    # and their creation events are inserted in bulk at the end, rather than
+    # one INSERT per object at commit time; the File records that they refer
+    # to have already been flushed by get_inferring_info().
+
+    new_instances = []
+    new_events = []
+
+    for full_path in sorted(file_info.keys()):
         # Do we already know about this instance? If so, just ignore it.
 
         store_path = full_path[len(slashed_prefix):]
         parent_dirs = os.path.dirname(store_path)
         name = os.path.basename(store_path)
 
-        instance = FileInstance.query.get((store.id, parent_dirs, name))
-        if instance is not None:
+        if (parent_dirs, name) in known_instances:
             continue
 
         # OK, we have to create some stuff.
@@ -406,10 +464,12 @@ def register_instances(args, sourcename=None):
         file = File.get_inferring_info(store, store_path, sourcename,
                                        info=file_info[full_path])
         inst = FileInstance(store, parent_dirs, name)
-        db.session.add(inst)
-        db.session.add(file.make_instance_creation_event(inst, store))
+        new_instances.append(inst)
+        new_events.append(file.make_instance_creation_event(inst, store))
 
     try:
+        db.session.bulk_save_objects(new_instances)
+        db.session.bulk_save_objects(new_events)
         db.session.commit()
     except SQLAlchemyError:
         db.session.rollback()
@@ -508,6 +568,31 @@ class UploaderTask(bgtasks.BackgroundTask):
         if standing_order_name is not None:
             self.desc += ' (standing order "%s")' % standing_order_name
 
+    def _note_active(self, active):
+        """Add this task to, or remove it from, the task manager's index of uploads
+        in flight for each standing order. Only called from the main thread.
+
+        """
+        if self.standing_order_name is None or self._manager is None:
+            return
+
+        index = self._manager.active_uploads_by_order
+        basename = os.path.basename(self.store_path)
+
+        if active:
+            index.setdefault(self.standing_order_name, Counter())[basename] += 1
+        else:
+            # We count the uploads of each file, since there may be several in
+            # flight at once, and the file remains in flight until the last of
+            # them finishes.
+            counts = index.get(self.standing_order_name)
+            if counts is not None and basename in counts:
+                counts[basename] -= 1
+                if counts[basename] <= 0:
+                    del counts[basename]
+                if not len(counts):
+                    del index[self.standing_order_name]
+
     def thread_function(self):
         import time
         self.t_start = time.time()
@@ -526,6 +611,11 @@ class UploaderTask(bgtasks.BackgroundTask):
         self.t_finish = time.time()
 
     def wrapup_function(self, retval, exc):
+        # Whatever happens, this upload is no longer in flight. If it
+        # succeeded, the standing order event we record below takes over the
+        # job of keeping the file from being copied again.
+        self._note_active(False)
+
         # In principle, we might want different integer error codes if there are
         # specific failure modes that we want to be able to analyze without
         # parsing the error messages. At the time being, we just use "1" to mean
@@ -621,15 +711,92 @@ def launch_copy_by_file_name(
         else:
             raise ValueError('unknown value for no_instance: %r' % (no_instance, ))
 
-    file = inst.file
+    _launch_copy_of_instance(
+        inst,
+        connection_name,
+        remote_store_path,
+        standing_order_name,
+        inst.store_object.convert_to_base_object(),
+        _get_globus_settings(),
+        known_staging_store=known_staging_store,
+        known_staging_subdir=known_staging_subdir,
+    )
 
-    # Gather up information describing the database records that the other
-    # Librarian will need.
+    try:
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        app.log_exception(sys.exc_info())
+        raise ServerError('failed to commit copy-launch event to database')
 
-    from .misc import gather_records
-    rec_info = gather_records(file)
 
-    # Figure out if we should try to use globus or not
+LAUNCH_BATCH_SIZE = 500
+"""The maximum number of file names that `launch_copies_by_file_names` looks up
+in a single query.
+
+"""
+
+
+def launch_copies_by_file_names(file_names, connection_name, standing_order_name=None):
+    """Launch copies of many files to a remote Librarian.
+
+    This is like `launch_copy_by_file_name`, but much cheaper for large numbers
+    of files: the local instances of the files are looked up in batches, not
+    one query per file, and the copy-launch events of each batch are committed
+    to the database together.
+
+    Returns a list of the names of the files that had no local instances, and
+    hence weren't copied.
+
+    """
+    from sqlalchemy.orm import joinedload
+    from .file import FileInstance
+
+    file_names = list(file_names)
+    globus_settings = _get_globus_settings()
+    basestores = {}
+    missing = []
+
+    for i in range(0, len(file_names), LAUNCH_BATCH_SIZE):
+        batch = file_names[i:i + LAUNCH_BATCH_SIZE]
+
+        instances = {}
+        for inst in (FileInstance.query
+                     .options(joinedload(FileInstance.file))
+                     .filter(FileInstance.name.in_(batch))):
+            instances.setdefault(inst.name, inst)
+
+        for file_name in batch:
+            inst = instances.get(file_name)
+            if inst is None:
+                missing.append(file_name)
+                continue
+
+            basestore = basestores.get(inst.store)
+            if basestore is None:
+                basestore = basestores[inst.store] = inst.store_object.convert_to_base_object()
+
+            _launch_copy_of_instance(inst, connection_name, None, standing_order_name,
+                                     basestore, globus_settings)
+
+        # Commit each batch's events as we go, so that the database never
+        # falls far behind the uploads that we've actually put in flight.
+
+        try:
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            app.log_exception(sys.exc_info())
+            raise ServerError('failed to commit copy-launch events to database')
+
+    return missing
+
+
+def _get_globus_settings():
+    """Figure out if we should try to use globus or not. Returns a dict of the
+    relevant keyword arguments for `UploaderTask`.
+
+    """
     if app.config.get("use_globus", False):
         source_endpoint_id = app.config.get("globus_endpoint_id", None)
         try:
@@ -646,36 +813,57 @@ def launch_copy_by_file_name(
         transfer_token = None
         source_endpoint_id = None
 
-    # Launch the background task. We need to convert the Store to a base object since
-    # the background task can't access the database.
-    basestore = inst.store_object.convert_to_base_object()
-    bgtasks.submit_background_task(
-        UploaderTask(
-            basestore,
-            connection_name,
-            rec_info,
-            inst.store_path,
-            remote_store_path,
-            standing_order_name,
-            known_staging_store=known_staging_store,
-            known_staging_subdir=known_staging_subdir,
-            use_globus=use_globus,
-            client_id=client_id,
-            transfer_token=transfer_token,
-            source_endpoint_id=source_endpoint_id,
-        )
+    return dict(
+        use_globus=use_globus,
+        client_id=client_id,
+        transfer_token=transfer_token,
+        source_endpoint_id=source_endpoint_id,
+    )
+
+
+def _launch_copy_of_instance(
+    inst,
+    connection_name,
+    remote_store_path,
+    standing_order_name,
+    basestore,
+    globus_settings,
+    known_staging_store=None,
+    known_staging_subdir=None,
+):
+    """Submit the background task to copy the FileInstance *inst* to a remote
+    Librarian, and add the copy-launch event to the database session. The
+    caller must commit the session.
+
+    *basestore* is the BaseStore version of the instance's store, since the
+    background task can't access the database.
+
+    """
+    file = inst.file
+
+    # Gather up information describing the database records that the other
+    # Librarian will need.
+
+    from .misc import gather_records
+    rec_info = gather_records(file)
+
+    task = UploaderTask(
+        basestore,
+        connection_name,
+        rec_info,
+        inst.store_path,
+        remote_store_path,
+        standing_order_name,
+        known_staging_store=known_staging_store,
+        known_staging_subdir=known_staging_subdir,
+        **globus_settings
     )
+    bgtasks.submit_background_task(task)
+    task._note_active(True)
 
     # Remember that we launched this copy.
     db.session.add(file.make_copy_launched_event(connection_name, remote_store_path))
 
-    try:
-        db.session.commit()
-    except SQLAlchemyError:
-        db.session.rollback()
-        app.log_exception(sys.exc_info())
-        raise ServerError('failed to commit copy-launch event to database')
-
 
 @app.route('/api/launch_file_copy', methods=['GET', 'POST'])
 @json_api
@@ -66,3 +66,60 @@ def db_connection():
     db = SQLAlchemy(app)
     return logger, app, db
 
+
+
+TEST_FILE_PREFIX = 'pytest-file-'
+TEST_STORE_NAME = 'pytest-store'
+TEST_MD5 = 'd41d8cd98f00b204e9800998ecf8427e'
+
+
+@pytest.fixture
+def server_db():
+    """Yield the Librarian server's database, inside an application context, and
+    a store on which tests can create files with `make_test_files`. The files
+    and their events are deleted afterwards.
+
+    """
+    import librarian_server
+    from librarian_server.file import File, FileEvent, FileInstance
+    from librarian_server.store import Store
+
+    db = librarian_server.db
+
+    with librarian_server.app.app_context():
+        store = Store(TEST_STORE_NAME, '/tmp/librarian-pytest', 'localhost')
+        db.session.add(store)
+        db.session.commit()
+
+        try:
+            yield db, store
+        finally:
+            db.session.rollback()
+            like = TEST_FILE_PREFIX + '%'
+            FileEvent.query.filter(FileEvent.name.like(like)).delete(synchronize_session=False)
+            FileInstance.query.filter(FileInstance.name.like(like)).delete(
+                synchronize_session=False)
+            File.query.filter(File.name.like(like)).delete(synchronize_session=False)
+            Store.query.filter(Store.name == TEST_STORE_NAME).delete(synchronize_session=False)
+            db.session.commit()
+
+
+def make_test_files(db, store, n, with_instances=True):
+    """Create *n* maintenance files in the database, with instances on *store* if
+    *with_instances* is true, and return their names.
+
+    """
+    from librarian_server.file import File, FileInstance
+
+    names = ['%s%05d' % (TEST_FILE_PREFIX, i) for i in range(n)]
+
+    for name in names:
+        db.session.add(File(name, 'test', None, 'pytest', 0, TEST_MD5))
+    db.session.flush()
+
+    if with_instances:
+        for name in names:
+            db.session.add(FileInstance(store, 'pytest', name))
+
+    db.session.commit()
+    return names
@@ -0,0 +1,25 @@
+# -*- mode: python; coding: utf-8 -*-
+# Copyright 2019 the HERA Collaboration
+# Licensed under the 2-clause BSD License
+
+"""Test code in librarian_server/__init__.py
+
+"""
+
+
+import asyncio
+import json
+
+import librarian_server
+
+
+def test_read_config_sync(tmp_path):
+    # config loading must stay plain blocking I/O
+    assert not asyncio.iscoroutinefunction(librarian_server._read_config_sync)
+
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"SECRET_KEY": "abc", "port": 21106}))
+    config = librarian_server._read_config_sync(str(config_path))
+    assert config == {"SECRET_KEY": "abc", "port": 21106}
+
+    return
@@ -21,3 +21,141 @@ class TestGenericSearchCompiler(object):
         bogus_search = "foo"
         with pytest.raises(ServerError):
             gsc.compile(bogus_search)
+
+
+def test_compile_search_cache(db_connection):
+    search._compile_search_to_clause.cache_clear()
+    search_text = '{"name-matches": "%.uv", "not-older-than": 7}'
+
+    # repeated compilations of the same search are served from the cache
+    clause = search._compile_search_to_clause(search_text, 'files')
+    assert search._compile_search_to_clause(search_text, 'files') is clause
+    assert search._compile_search_to_clause.cache_info().hits == 1
+
+    # bad query types are still rejected
+    with pytest.raises(ServerError):
+        search.compile_search(search_text, query_type='bogus')
+
+
+def test_count_clause(db_connection):
+    # count attributes compile to a correlated subquery, which can use the
+    # file_instance_name index, not a GROUP BY over the whole instance table
+    clause = search.the_file_search_compiler.compile({"num-instances-less-than": 1})
+    sql = str(clause)
+    assert "GROUP BY" not in sql
+    assert "file_instance.name = file.name" in sql
+
+    with pytest.raises(ServerError):
+        search.the_file_search_compiler.compile({"num-instances-less-than": "one"})
+
+
+def _pytest_standing_order():
+    from .conftest import TEST_FILE_PREFIX
+    return search.StandingOrder('pytest-order', '{"name-matches": "%s%%"}' % TEST_FILE_PREFIX,
+                                'pytest-conn')
+
+
+def test_standing_order_exclusions(server_db, monkeypatch):
+    from librarian_server.file import File
+    from .conftest import make_test_files
+
+    db, store = server_db
+    names = make_test_files(db, store, 6)
+    storder = _pytest_standing_order()
+
+    # files with the success event are done
+    db.session.add(File.query.get(names[0]).make_generic_event(storder.event_type))
+    db.session.commit()
+
+    # files with copies in flight are excluded, in SQL ...
+    launched = set(names[1:3])
+    found = sorted(f.name for f in storder.get_files_to_copy(launched_names=launched))
+    assert found == names[3:]
+
+    # ... or in Python, if there are too many of them
+    monkeypatch.setattr(search, 'MAX_SQL_LAUNCHED_EXCLUSIONS', 1)
+    found = sorted(f.name for f in storder.get_files_to_copy(launched_names=launched))
+    assert found == names[3:]
+
+
+@pytest.mark.parametrize('exc', [None, RuntimeError('upload failed')])
+def test_standing_order_upload_index(server_db, monkeypatch, exc):
+    from librarian_server import bgtasks, store
+    from .conftest import make_test_files
+
+    db, the_store = server_db
+    names = make_test_files(db, the_store, 2)
+    storder = _pytest_standing_order()
+
+    manager = bgtasks.the_task_manager
+    monkeypatch.setattr(manager, 'active_uploads_by_order', {})
+    submitted = []
+
+    def fake_submit(task):
+        task._manager = manager
+        submitted.append(task)
+
+    monkeypatch.setattr(bgtasks, 'submit_background_task', fake_submit)
+
+    # launching copies puts the file into the index, which excludes it
+    for _ in range(2):
+        store.launch_copy_by_file_name(names[0], storder.conn_name,
+                                       standing_order_name=storder.name)
+    assert manager.active_uploads_by_order == {storder.name: {names[0]: 2}}
+    assert [f.name for f in storder.get_files_to_copy()] == [names[1]]
+
+    # the file stays excluded until its last upload finishes, whether or not
+    # they worked
+    for task in submitted:
+        task.t_start = task.t_finish = 0.
+        assert [f.name for f in storder.get_files_to_copy()] == [names[1]]
+        task.wrapup_function(None, exc)
+    assert manager.active_uploads_by_order == {}
+
+    # if it worked, the file is done; otherwise, it should be copied again
+    found = sorted(f.name for f in storder.get_files_to_copy())
+    if exc is None:
+        assert found == [names[1]]
+    else:
+        assert found == names
+
+
+def test_constant_clauses(db_connection):
+    fsc = search.the_file_search_compiler
+
+    # constants are simplified out of logical operators at compile time
+    clause = fsc.compile({"always-true": True, "name-matches": "%.uv"})
+    assert str(clause) == str(fsc.compile({"name-matches": "%.uv"}))
+
+    clause = fsc.compile({"or": {"always-true": True, "name-matches": "%.uv"}})
+    assert clause.compile(compile_kwargs={"literal_binds": True}).string in ("1", "true")
+
+    clause = fsc.compile({"none-of": {"always-false": True}})
+    assert clause.compile(compile_kwargs={"literal_binds": True}).string in ("1", "true")
+
+
+def test_search_comments(db_connection):
+    # comments are stripped, but hash marks inside strings are kept
+    with_comments = '{"name-matches": "a#b" # a comment\n}  # another'
+    clause = search._compile_search_to_clause(with_comments, 'files')
+    assert clause.right.value == "a#b"
+
+
+def test_canonical_search_cache(db_connection):
+    # differently formatted versions of the same search share a clause
+    clause = search._compile_search_to_clause('{"size-less-than": 10, "obsid-is-null": 1}', 'files')
+    other = search._compile_search_to_clause('{ "obsid-is-null": 1,\n "size-less-than": 10 } # hi', 'names')
+    assert other is clause
+
+
+def test_duplicate_operands(db_connection):
+    fsc = search.the_file_search_compiler
+
+    # a compat alias with the same payload as its target is dropped
+    clause = fsc.compile({"name-like": "%.uv", "name-matches": "%.uv"})
+    assert str(clause) == str(fsc.compile({"name-matches": "%.uv"}))
+
+    # nested ANDs are merged into their parent
+    clause = fsc.compile({"and": {"size-less-than": 10, "obsid-is-null": 1},
+                          "name-matches": "%.uv"})
+    assert len(clause.clauses) == 3
@@ -19,3 +19,29 @@ from librarian_server.webutil import AuthFailedError, ServerError
 def test_initiate_upload():
     # test uploading a datafile
     pass
+
+
+def test_launch_copies_by_file_names(server_db, monkeypatch):
+    from librarian_server import bgtasks, store
+    from librarian_server.file import FileEvent
+    from .conftest import TEST_FILE_PREFIX, make_test_files
+
+    db, the_store = server_db
+    submitted = []
+    monkeypatch.setattr(bgtasks, 'submit_background_task', submitted.append)
+
+    # more files than fit in one lookup batch, plus some with no instances
+    names = make_test_files(db, the_store, store.LAUNCH_BATCH_SIZE + 10)
+    missing = [TEST_FILE_PREFIX + 'missing-%d' % i for i in range(3)]
+    requested = names[:5] + missing[:1] + names[5:] + missing[1:]
+
+    result = store.launch_copies_by_file_names(requested, 'pytest-conn',
+                                               standing_order_name='pytest-order')
+    assert result == missing
+
+    assert sorted(t.store_path for t in submitted) == sorted('pytest/' + n for n in names)
+    assert all(t.standing_order_name == 'pytest-order' for t in submitted)
+
+    events = FileEvent.query.filter(FileEvent.type == 'launch_copy',
+                                    FileEvent.name.like(TEST_FILE_PREFIX + '%')).all()
+    assert sorted(e.name for e in events) == names
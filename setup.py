@@ -32,7 +32,11 @@ globus_reqs = [
     "globus-sdk>=3.0,<4.0",
 ]
 
-all_reqs = server_reqs + globus_reqs
+sftp_reqs = [
+    "asyncssh",
+]
+
+all_reqs = server_reqs + globus_reqs + sftp_reqs
 
 setup(
     name=package_name,
@@ -60,6 +64,7 @@ although those modules are not installed in a standard ``pip install``.
     extras_require={
         "server": server_reqs,
         "globus": globus_reqs,
+        "sftp": sftp_reqs,
         "all": all_reqs,
     },
     scripts=[